@@ -0,0 +1,152 @@
+import time
+
+import numpy as np
+
+try:
+    # Optional: a JIT-compiled scan avoids BLAS dispatch overhead when the
+    # full-scan fallback has to score every cached vector
+    from numba import njit
+
+    @njit(fastmath=True, cache=True)
+    def _best_cosine(matrix, scales, query, query_scale):
+        best_score = -1e30
+        best_index = 0
+        for i in range(matrix.shape[0]):
+            acc = 0
+            for j in range(matrix.shape[1]):
+                acc += np.int32(matrix[i, j]) * np.int32(query[j])
+            score = acc * scales[i] * query_scale
+            if score > best_score:
+                best_score = score
+                best_index = i
+        return best_index, best_score
+except ImportError:
+    _best_cosine = None
+
+
+class SemanticCache:
+    """Answer cache keyed by query-embedding similarity.
+
+    Near-duplicate chat prompts ("What are revenues?" vs "Show me revenue")
+    embed to almost the same vector, so a cosine check against previous
+    queries lets them skip the whole embed + search + LLM pipeline.
+
+    Lookups are bucketed with a random sign-projection hash: only entries
+    whose hash matches the query (or differs by one bit) are
+    cosine-compared, so lookup cost stays flat as the cache grows. An
+    empty bucket falls back to a full scan, which keeps recall intact.
+
+    Answers can depend on state outside the prompt (the active company,
+    what has been ingested), so each entry carries an opaque context
+    value and a lookup only hits when the stored context matches.
+    """
+
+    def __init__(self, embed_fn, threshold=0.95, ttl=3600, max_entries=4096, hash_bits=16):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hash_bits = hash_bits
+        self.projection = None   # [d, hash_bits], built once the dimension is known
+        # Vectors are held as int8 with a per-row dequantization scale, a
+        # quarter of the float32 footprint with negligible cosine error at
+        # the 0.95 threshold
+        self.vectors = None      # int8 [N, d], rows L2-normalized pre-quantization
+        self.scales = None       # float32 [N]
+        self.entries = []        # (answer, timestamp, context), parallel to vectors
+        self.buckets = {}        # hash key -> list of row indices
+
+    def embed(self, text):
+        """Normalized query embedding, ready for cosine via dot product"""
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hash(self, vector):
+        if self.projection is None:
+            rng = np.random.default_rng(0)
+            self.projection = rng.standard_normal(
+                (vector.shape[0], self.hash_bits)
+            ).astype(np.float32)
+        bits = (vector @ self.projection) >= 0
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    @staticmethod
+    def _quantize(vector):
+        """Symmetric int8 quantization with a per-vector scale"""
+        scale = float(np.abs(vector).max()) / 127.0
+        if scale == 0.0:
+            return vector.astype(np.int8), 0.0
+        return np.round(vector / scale).astype(np.int8), scale
+
+    def _candidates(self, key):
+        """Row indices in the query's bucket and its Hamming-1 neighbors"""
+        indices = list(self.buckets.get(key, ()))
+        for bit in range(self.hash_bits):
+            indices.extend(self.buckets.get(key ^ (1 << bit), ()))
+        return indices
+
+    def clear(self):
+        """Drop every entry, e.g. after the underlying corpus changes"""
+        self.vectors = None
+        self.scales = None
+        self.entries = []
+        self.buckets = {}
+
+    def lookup(self, vector, context=None):
+        """Return the cached answer for the closest stored query, or None.
+
+        The stored context must equal the caller's; a mismatch on the best
+        candidate is treated as a miss rather than re-scanning, which is
+        occasionally conservative but never serves a stale answer.
+        """
+        if self.vectors is None:
+            return None
+        quantized, scale = self._quantize(vector)
+        indices = self._candidates(self._hash(vector))
+        if indices:
+            dots = self.vectors[indices].astype(np.int32) @ quantized.astype(np.int32)
+            scores = dots * self.scales[indices] * scale
+            best = indices[int(np.argmax(scores))]
+            best_score = float(scores.max())
+        elif _best_cosine is not None:
+            # Nothing hashed nearby; scan everything rather than miss
+            best, best_score = _best_cosine(self.vectors, self.scales, quantized, scale)
+            best = int(best)
+        else:
+            dots = self.vectors.astype(np.int32) @ quantized.astype(np.int32)
+            scores = dots * self.scales * scale
+            best = int(np.argmax(scores))
+            best_score = float(scores[best])
+        answer, stored_at, stored_context = self.entries[best]
+        if (
+            best_score >= self.threshold
+            and time.time() - stored_at < self.ttl
+            and stored_context == context
+        ):
+            return answer
+        return None
+
+    def store(self, vector, answer, context=None):
+        if len(self.entries) >= self.max_entries:
+            # Keep the newest half and rebuild the buckets once, so
+            # eviction cost is amortized instead of paid on every store
+            keep = self.max_entries // 2
+            self.vectors = self.vectors[-keep:]
+            self.scales = self.scales[-keep:]
+            self.entries = self.entries[-keep:]
+            self.buckets = {}
+            for i in range(keep):
+                # The sign pattern is scale-invariant, so hashing the int8
+                # row lands in the same bucket as the original vector
+                self.buckets.setdefault(self._hash(self.vectors[i].astype(np.float32)), []).append(i)
+        quantized, scale = self._quantize(vector)
+        row = quantized[np.newaxis, :]
+        if self.vectors is None:
+            self.vectors = row
+            self.scales = np.array([scale], dtype=np.float32)
+        else:
+            self.vectors = np.vstack([self.vectors, row])
+            self.scales = np.append(self.scales, np.float32(scale))
+        self.entries.append((answer, time.time(), context))
+        self.buckets.setdefault(self._hash(vector), []).append(len(self.entries) - 1)
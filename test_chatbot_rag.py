@@ -0,0 +1,73 @@
+"""Retrieval regression tests for the FAISS store wiring.
+
+These exercise the real _search path with a deterministic stub embedder,
+so they catch the score-threshold comparator flipping direction without
+downloading the MiniLM weights.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("langchain_groq")
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+
+import chatbot_rag
+
+
+def _unit_vector(text):
+    """Deterministic L2-normalized embedding derived from the text"""
+    seed = abs(hash(text)) % (2 ** 32)
+    vector = np.random.default_rng(seed).standard_normal(chatbot_rag.EMBED_DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+
+class _StubEmbeddings:
+    def embed_documents(self, texts):
+        return [_unit_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return _unit_vector(text)
+
+
+def _make_rag():
+    """RedditRAG with the production store wiring but a stub embedder"""
+    rag = chatbot_rag.RedditRAG.__new__(chatbot_rag.RedditRAG)
+    rag.embeddings = _StubEmbeddings()
+    rag.vector_store = FAISS(
+        embedding_function=rag.embeddings,
+        index=faiss.IndexFlatIP(chatbot_rag.EMBED_DIM),
+        docstore=InMemoryDocstore({}),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+    return rag
+
+
+def test_indexed_document_is_retrievable():
+    rag = _make_rag()
+    text = "Acme Corp beats quarterly revenue estimates"
+    rag.vector_store.add_documents([Document(page_content=text)])
+
+    docs = rag._search(rag.embeddings.embed_query(text))
+
+    assert docs, "an exact-match query must clear the score threshold"
+    assert docs[0].page_content == text
+
+
+def test_unrelated_document_is_filtered():
+    rag = _make_rag()
+    rag.vector_store.add_documents(
+        [Document(page_content="Acme Corp beats quarterly revenue estimates")]
+    )
+
+    # Independent random unit vectors are near-orthogonal at 384 dims, so
+    # this stays far below the threshold
+    docs = rag._search(rag.embeddings.embed_query("completely different topic"))
+
+    assert docs == []